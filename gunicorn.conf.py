@@ -0,0 +1,15 @@
+import multiprocessing
+import os
+
+# Drafts are only shared between workers through Redis, so without REDIS_URL
+# stay on a single worker; override either way with WEB_CONCURRENCY.
+_default_workers = multiprocessing.cpu_count() * 2 + 1 if os.getenv("REDIS_URL") else 1
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", _default_workers))
+# Workers inherit this, so the app can split per-process limits (ClickUp rate) between them
+os.environ["WEB_CONCURRENCY"] = str(workers)
+# UvicornWorker picks uvloop and httptools automatically (installed via uvicorn[standard])
+worker_class = "uvicorn_worker.UvicornWorker"
+timeout = 30
+graceful_timeout = 30
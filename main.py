@@ -1,25 +1,77 @@
-import os
-import json
+import asyncio
+import logging
 import time
-from typing import Dict, Any, Optional
-
-import requests
+import types
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, Set
+
+import httpx
+import orjson
+import redis.asyncio as redis
+from aiolimiter import AsyncLimiter
+from cachetools import TTLCache
 from fastapi import FastAPI, Request
-
-app = FastAPI()
-
-TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN", "")
-CLICKUP_TOKEN = os.getenv("CLICKUP_TOKEN", "")
-DEFAULT_LIST_ID = os.getenv("CLICKUP_DEFAULT_LIST_ID", "")
-
-LIST_ROUTING_JSON = os.getenv("LIST_ROUTING_JSON", "{}")
+from fastapi.responses import ORJSONResponse
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+class Settings(BaseSettings):
+    # Read from the environment once (TELEGRAM_TOKEN, CLICKUP_TOKEN, ...)
+    model_config = SettingsConfigDict(frozen=True)
+
+    telegram_token: str = ""
+    clickup_token: str = ""
+    clickup_default_list_id: str = ""
+    list_routing_json: str = "{}"
+    redis_url: str = ""
+    # Set by gunicorn.conf.py so per-process limits can be split across workers
+    web_concurrency: int = Field(1, ge=1)
+
+settings = Settings()
+
+# Max in-flight outbound calls per worker; the HTTP pool holds both at once
+# so a Telegram burst can't starve ClickUp of connections.
+TG_CONCURRENCY = 30
+CLICKUP_CONCURRENCY = 10
+HTTP_POOL_SIZE = TG_CONCURRENCY + CLICKUP_CONCURRENCY
+
+# Kept below gunicorn's graceful_timeout so the worker isn't killed mid-drain
+SHUTDOWN_GRACE_SECONDS = 25
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One shared client for all outbound Telegram/ClickUp calls; closed on shutdown.
+    app.state.http = httpx.AsyncClient(
+        timeout=20,
+        limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE),
+        headers={"User-Agent": "clickup-automation-bot"},
+    )
+    # Drafts live in Redis when configured so every worker sees the same drafts
+    app.state.redis = redis.from_url(settings.redis_url) if settings.redis_url else None
+    try:
+        yield
+    finally:
+        await drain_pending_tasks(SHUTDOWN_GRACE_SECONDS)
+        await app.state.http.aclose()
+        if app.state.redis is not None:
+            await app.state.redis.aclose()
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# Parsed once at startup and read-only afterwards
 try:
-    LIST_ROUTING = {k.lower(): str(v) for k, v in json.loads(LIST_ROUTING_JSON).items()}
-except Exception:
-    LIST_ROUTING = {}
+    LIST_ROUTING = types.MappingProxyType(
+        {k.strip().lower(): str(v) for k, v in orjson.loads(settings.list_routing_json).items()}
+    )
+except (orjson.JSONDecodeError, AttributeError):
+    # Invalid JSON, or JSON that isn't an object
+    LIST_ROUTING = types.MappingProxyType({})
+
+# Abandoned drafts expire after this long
+DRAFT_TTL_SECONDS = 60 * 60
 
-# In-memory drafts: chat_id -> draft
-DRAFTS: Dict[int, Dict[str, Any]] = {}
+# In-memory drafts (used when REDIS_URL is unset): chat_id -> draft
+DRAFTS: TTLCache = TTLCache(maxsize=10_000, ttl=DRAFT_TTL_SECONDS)
 
 PRIORITIES = [("Urgent", 1), ("High", 2), ("Normal", 3), ("Low", 4)]
 DUE_CHOICES = [
@@ -28,29 +80,91 @@ DUE_CHOICES = [
     ("Tomorrow", "tomorrow"),
     ("This week", "thisweek"),
 ]
-
-def tg_api(method: str) -> str:
-    return f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/{method}"
-
-def clickup_headers() -> Dict[str, str]:
-    return {"Authorization": CLICKUP_TOKEN, "Content-Type": "application/json"}
-
-def send_message(chat_id: int, text: str, reply_markup: Optional[dict] = None):
+PRIORITY_LABELS = {num: label for label, num in PRIORITIES}
+DUE_LABELS = {val: label for label, val in DUE_CHOICES}
+
+# Values are immutable, so a shallow dict() copy is enough for a fresh draft
+_DEFAULT_DRAFT: Dict[str, Any] = {
+    "title": "",
+    "project": "default",
+    "priority": 3,
+    "priority_label": "Normal",
+    "due": None,
+    "due_label": "No due date",
+}
+
+TG_API_BASE = f"https://api.telegram.org/bot{settings.telegram_token}"
+TG_SEND_MESSAGE_URL = f"{TG_API_BASE}/sendMessage"
+TG_EDIT_MESSAGE_URL = f"{TG_API_BASE}/editMessageText"
+TG_ANSWER_CALLBACK_URL = f"{TG_API_BASE}/answerCallbackQuery"
+
+JSON_HEADERS: Dict[str, str] = {"Content-Type": "application/json"}
+CLICKUP_HEADERS: Dict[str, str] = {"Authorization": settings.clickup_token, **JSON_HEADERS}
+
+logger = logging.getLogger(__name__)
+
+# Strong refs to fire-and-forget tasks so they aren't garbage-collected mid-flight
+PENDING_TASKS: Set[asyncio.Task] = set()
+
+def log_task_failure(task: asyncio.Task):
+    # Nobody awaits background tasks, so surface their errors here
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background task failed", exc_info=task.exception())
+
+def spawn(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    PENDING_TASKS.add(task)
+    task.add_done_callback(PENDING_TASKS.discard)
+    task.add_done_callback(log_task_failure)
+    return task
+
+async def drain_pending_tasks(timeout: float):
+    # Background tasks may spawn follow-ups (e.g. the result edit), so keep
+    # waiting until the set is empty or time runs out.
+    deadline = time.monotonic() + timeout
+    while PENDING_TASKS:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logger.warning("Shutting down with %d background tasks still running", len(PENDING_TASKS))
+            return
+        await asyncio.wait(set(PENDING_TASKS), timeout=remaining)
+
+# Cap in-flight outbound calls so a webhook burst doesn't open hundreds of
+# connections. ClickUp allows 100 requests/min per token; stay under that
+# across all workers, since each worker has its own limiter.
+CLICKUP_RATE_PER_MINUTE = 90
+TG_SEM = asyncio.Semaphore(TG_CONCURRENCY)
+CLICKUP_SEM = asyncio.Semaphore(CLICKUP_CONCURRENCY)
+CLICKUP_LIMITER = AsyncLimiter(max(1, CLICKUP_RATE_PER_MINUTE // settings.web_concurrency), 60)
+
+def http_client() -> httpx.AsyncClient:
+    return app.state.http
+
+async def tg_post(url: str, payload: Dict[str, Any]):
+    async with TG_SEM:
+        await http_client().post(url, content=orjson.dumps(payload), headers=JSON_HEADERS)
+
+async def send_message(chat_id: int, text: str, reply_markup: Optional[Any] = None):
     payload: Dict[str, Any] = {"chat_id": chat_id, "text": text}
-    if reply_markup:
+    if reply_markup is not None:
         payload["reply_markup"] = reply_markup
-    requests.post(tg_api("sendMessage"), json=payload, timeout=20)
+    await tg_post(TG_SEND_MESSAGE_URL, payload)
 
-def edit_message(chat_id: int, message_id: int, text: str, reply_markup: Optional[dict] = None):
+async def edit_message(chat_id: int, message_id: int, text: str, reply_markup: Optional[Any] = None):
     payload: Dict[str, Any] = {"chat_id": chat_id, "message_id": message_id, "text": text}
-    if reply_markup:
+    if reply_markup is not None:
         payload["reply_markup"] = reply_markup
-    requests.post(tg_api("editMessageText"), json=payload, timeout=20)
+    await tg_post(TG_EDIT_MESSAGE_URL, payload)
 
-def answer_callback(callback_id: str):
-    requests.post(tg_api("answerCallbackQuery"), json={"callback_query_id": callback_id}, timeout=20)
+async def edit_message_after(previous: asyncio.Task, chat_id: int, message_id: int, text: str):
+    # Let an earlier edit of the same message land first so it can't overwrite this one
+    await asyncio.wait([previous])
+    await edit_message(chat_id, message_id, text)
 
-def create_clickup_task(list_id: str, name: str, description: str = "", due_date_ms: Optional[int] = None, priority: Optional[int] = None):
+async def answer_callback(callback_id: str):
+    await tg_post(TG_ANSWER_CALLBACK_URL, {"callback_query_id": callback_id})
+
+async def create_clickup_task(list_id: str, name: str, description: str = "", due_date_ms: Optional[int] = None, priority: Optional[int] = None):
     url = f"https://api.clickup.com/api/v2/list/{list_id}/task"
     payload: Dict[str, Any] = {"name": name}
     if description:
@@ -60,39 +174,142 @@ def create_clickup_task(list_id: str, name: str, description: str = "", due_date
     if priority is not None:
         payload["priority"] = priority
 
-    r = requests.post(url, headers=clickup_headers(), json=payload, timeout=30)
+    async with CLICKUP_SEM, CLICKUP_LIMITER:
+        r = await http_client().post(url, headers=CLICKUP_HEADERS, content=orjson.dumps(payload), timeout=30)
     r.raise_for_status()
-    return r.json()
+    return orjson.loads(r.content)
+
+def draft_key(chat_id: int) -> str:
+    return f"draft:{chat_id}"
+
+# In Redis a draft is a hash with one orjson-encoded value per field, so concurrent
+# button presses each write only the fields they change.
+def encode_draft_fields(fields: Dict[str, Any]) -> Dict[str, bytes]:
+    return {k: orjson.dumps(v) for k, v in fields.items()}
+
+def decode_draft(raw: Dict[bytes, bytes]) -> Dict[str, Any]:
+    return {**_DEFAULT_DRAFT, **{k.decode(): orjson.loads(v) for k, v in raw.items()}}
+
+async def get_draft(chat_id: int) -> Optional[Dict[str, Any]]:
+    r = app.state.redis
+    if r is None:
+        return DRAFTS.get(chat_id)
+    raw = await r.hgetall(draft_key(chat_id))
+    return decode_draft(raw) if raw else None
+
+async def set_draft(chat_id: int, draft: Dict[str, Any]):
+    # Replace the whole draft
+    r = app.state.redis
+    if r is None:
+        DRAFTS[chat_id] = draft
+        return
+    key = draft_key(chat_id)
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.delete(key)
+        pipe.hset(key, mapping=encode_draft_fields(draft))
+        pipe.expire(key, DRAFT_TTL_SECONDS)
+        await pipe.execute()
+
+async def update_draft(chat_id: int, **fields: Any) -> Dict[str, Any]:
+    # Change only the given fields and return the resulting draft
+    r = app.state.redis
+    if r is None:
+        draft = DRAFTS.get(chat_id) or dict(_DEFAULT_DRAFT)
+        draft.update(fields)
+        DRAFTS[chat_id] = draft  # re-insert to restart the TTL
+        return draft
+    key = draft_key(chat_id)
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping=encode_draft_fields(fields))
+        pipe.expire(key, DRAFT_TTL_SECONDS)
+        pipe.hgetall(key)
+        *_, raw = await pipe.execute()
+    return decode_draft(raw)
+
+async def claim_draft(chat_id: int) -> Optional[Dict[str, Any]]:
+    # Atomically remove and return the draft; only one caller can get it
+    r = app.state.redis
+    if r is None:
+        return DRAFTS.pop(chat_id, None)
+    key = draft_key(chat_id)
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.hgetall(key)
+        pipe.delete(key)
+        raw, _ = await pipe.execute()
+    return decode_draft(raw) if raw else None
+
+async def restore_draft(chat_id: int, draft: Dict[str, Any]):
+    # Put a claimed draft back, unless the user has started a new one meanwhile
+    r = app.state.redis
+    if r is None:
+        DRAFTS.setdefault(chat_id, draft)
+        return
+    key = draft_key(chat_id)
+    async with r.pipeline(transaction=True) as pipe:
+        await pipe.watch(key)
+        if await pipe.exists(key):
+            return
+        pipe.multi()
+        pipe.hset(key, mapping=encode_draft_fields(draft))
+        pipe.expire(key, DRAFT_TTL_SECONDS)
+        try:
+            await pipe.execute()
+        except redis.WatchError:
+            pass  # a new draft was written between the check and the write
+
+async def drop_draft(chat_id: int):
+    r = app.state.redis
+    if r is None:
+        DRAFTS.pop(chat_id, None)
+        return
+    await r.delete(draft_key(chat_id))
 
 def resolve_list_id(project_key: Optional[str]) -> str:
-    if project_key:
-        k = project_key.strip().lower()
-        if k in LIST_ROUTING:
-            return LIST_ROUTING[k]
-    return DEFAULT_LIST_ID
+    if project_key is None:
+        return settings.clickup_default_list_id
+    return LIST_ROUTING.get(project_key.strip().lower(), settings.clickup_default_list_id)
+
+# Due timestamps are approximate anyway, so recompute the table at most hourly
+DUE_CACHE_SECONDS = 60 * 60
+_DUE_CACHE: Dict[str, Any] = {"ts": 0, "table": {}}
 
 def due_choice_to_epoch_ms(choice: Optional[str]) -> Optional[int]:
     if choice is None:
         return None
 
-    # Simple "end of day" timestamps in local time (approx)
     now = int(time.time())
-    # We'll approximate day boundaries using UTC seconds; good enough for reminders.
-    # If you want exact Asia/Riyadh midnight handling, we can add timezone libs later.
-    day = 24 * 60 * 60
-
-    if choice == "today":
-        # end of today (approx): now + (remaining hours) is complex; simplest: +8 hours
-        return (now + 8 * 60 * 60) * 1000
-    if choice == "tomorrow":
-        return (now + day + 8 * 60 * 60) * 1000
-    if choice == "thisweek":
-        return (now + 3 * day) * 1000
-
-    return None
-
-def menu_markup(chat_id: int) -> dict:
-    draft = DRAFTS.get(chat_id, {})
+    if now - _DUE_CACHE["ts"] > DUE_CACHE_SECONDS:
+        # Simple "end of day" timestamps in local time (approx)
+        # We'll approximate day boundaries using UTC seconds; good enough for reminders.
+        # If you want exact Asia/Riyadh midnight handling, we can add timezone libs later.
+        hour = 60 * 60
+        _DUE_CACHE["table"] = {
+            # end of today (approx): now + (remaining hours) is complex; simplest: +8 hours
+            "today": (now + 8 * hour) * 1000,
+            "tomorrow": (now + 32 * hour) * 1000,
+            "thisweek": (now + 72 * hour) * 1000,
+        }
+        _DUE_CACHE["ts"] = now
+
+    return _DUE_CACHE["table"].get(choice)
+
+# The menu keyboard never depends on the draft (LIST_ROUTING is fixed at startup),
+# so build it once instead of on every button press.
+_TITLE_BUTTONS = [[{"text": "✏️ Set/Change Title", "callback_data": "ask_title"}]]
+_PROJECT_BUTTONS = [[{"text": f"📁 {k}", "callback_data": f"set_project:{k}"}] for k in list(LIST_ROUTING.keys())[:6]]
+_PROJECT_BUTTONS.append([{"text": "📁 Default list", "callback_data": "set_project:default"}])
+_PRIORITY_BUTTONS = [[{"text": f"⭐ {label}", "callback_data": f"set_priority:{num}"}] for label, num in PRIORITIES]
+_DUE_BUTTONS = [[{"text": f"🗓 {label}", "callback_data": f"set_due:{val if val else 'none'}"}] for label, val in DUE_CHOICES]
+_TAIL_BUTTONS = [[{"text": "✅ Create Task", "callback_data": "confirm_create"}],
+                 [{"text": "🗑 Cancel", "callback_data": "cancel"}]]
+
+MENU_REPLY_MARKUP = {
+    "inline_keyboard": _TITLE_BUTTONS + _PROJECT_BUTTONS + _PRIORITY_BUTTONS + _DUE_BUTTONS + _TAIL_BUTTONS
+}
+# Pre-encoded keyboard; orjson embeds the bytes as-is instead of re-serializing them
+MENU_REPLY_MARKUP_JSON = orjson.Fragment(orjson.dumps(MENU_REPLY_MARKUP))
+
+def menu_markup(draft: Dict[str, Any]) -> dict:
     title = draft.get("title", "(none)")
     project = draft.get("project", "default")
     priority = draft.get("priority_label", "Normal")
@@ -107,25 +324,84 @@ def menu_markup(chat_id: int) -> dict:
         f"Choose what to set:"
     )
 
-    # Build buttons
-    project_buttons = []
-    if LIST_ROUTING:
-        for k in list(LIST_ROUTING.keys())[:6]:
-            project_buttons.append([{"text": f"📁 {k}", "callback_data": f"set_project:{k}"}])
-    project_buttons.append([{"text": "📁 Default list", "callback_data": "set_project:default"}])
-
-    priority_buttons = [[{"text": f"⭐ {label}", "callback_data": f"set_priority:{num}"}] for label, num in PRIORITIES]
-    due_buttons = [[{"text": f"🗓 {label}", "callback_data": f"set_due:{val if val else 'none'}"}] for label, val in DUE_CHOICES]
-
-    keyboard = []
-    keyboard += [[{"text": "✏️ Set/Change Title", "callback_data": "ask_title"}]]
-    keyboard += project_buttons
-    keyboard += priority_buttons
-    keyboard += due_buttons
-    keyboard += [[{"text": "✅ Create Task", "callback_data": "confirm_create"}],
-                 [{"text": "🗑 Cancel", "callback_data": "cancel"}]]
-
-    return {"text": text, "reply_markup": {"inline_keyboard": keyboard}}
+    return {"text": text, "reply_markup": MENU_REPLY_MARKUP_JSON}
+
+async def refresh_menu(chat_id: int, message_id: int, **fields: Any):
+    draft = await update_draft(chat_id, **fields)
+    spawn(edit_message(chat_id, message_id, **menu_markup(draft)))
+
+# Every webhook reply is identical, so serialize it once and reuse the Response
+OK_RESPONSE = ORJSONResponse({"ok": True})
+
+async def create_task_from_draft(draft: Dict[str, Any], chat_id: int, message_id: int, title: str):
+    list_id = resolve_list_id(None if draft.get("project") == "default" else draft.get("project"))
+    due_ms = due_choice_to_epoch_ms(draft.get("due"))
+    prio = draft.get("priority")
+
+    # Show progress while ClickUp works so the two round-trips overlap
+    progress = spawn(edit_message(chat_id, message_id, "⏳ Creating in ClickUp..."))
+    try:
+        task = await create_clickup_task(
+            list_id=list_id,
+            name=title[:200],
+            description=draft.get("description", ""),
+            due_date_ms=due_ms,
+            priority=prio,
+        )
+        result = f"✅ Created in ClickUp: {task.get('name')}"
+    except Exception as e:
+        # Give the draft back so the user can retry
+        await restore_draft(chat_id, draft)
+        result = f"❌ Failed to create task: {e}"
+    spawn(edit_message_after(progress, chat_id, message_id, result))
+
+# Button handlers, keyed on the callback_data prefix before ":"
+async def on_ask_title(chat_id: int, message_id: int, arg: str):
+    await update_draft(chat_id, awaiting_title=True)
+    spawn(edit_message(chat_id, message_id, "Reply with the task title (just send a message)."))
+
+async def on_set_project(chat_id: int, message_id: int, arg: str):
+    await refresh_menu(chat_id, message_id, project=arg)
+
+async def on_set_priority(chat_id: int, message_id: int, arg: str):
+    num = int(arg)
+    await refresh_menu(chat_id, message_id, priority=num, priority_label=PRIORITY_LABELS.get(num, "Normal"))
+
+async def on_set_due(chat_id: int, message_id: int, arg: str):
+    if arg == "none":
+        await refresh_menu(chat_id, message_id, due=None, due_label="No due date")
+    else:
+        await refresh_menu(chat_id, message_id, due=arg, due_label=DUE_LABELS.get(arg, arg))
+
+async def on_confirm_create(chat_id: int, message_id: int, arg: str):
+    # Claim the draft before calling ClickUp so a second tap or a redelivered
+    # update can't create the same task twice
+    draft = await claim_draft(chat_id)
+    if draft is None:
+        return
+
+    title = (draft.get("title") or "").strip()
+    if not title:
+        await restore_draft(chat_id, draft)
+        spawn(edit_message(chat_id, message_id, "❌ Title is empty. Tap “Set/Change Title”."))
+        return
+
+    # ClickUp calls can wait on the rate limiter, so don't hold the webhook
+    # response (Telegram would redeliver the update)
+    spawn(create_task_from_draft(draft, chat_id, message_id, title))
+
+async def on_cancel(chat_id: int, message_id: int, arg: str):
+    await drop_draft(chat_id)
+    spawn(edit_message(chat_id, message_id, "🗑 Cancelled."))
+
+CALLBACK_HANDLERS = {
+    "ask_title": on_ask_title,
+    "set_project": on_set_project,
+    "set_priority": on_set_priority,
+    "set_due": on_set_due,
+    "confirm_create": on_confirm_create,
+    "cancel": on_cancel,
+}
 
 @app.get("/")
 def health():
@@ -133,7 +409,7 @@ def health():
 
 @app.post("/telegram")
 async def telegram_webhook(req: Request):
-    update = await req.json()
+    update = orjson.loads(await req.body())
 
     # Handle button presses
     if "callback_query" in update:
@@ -144,103 +420,45 @@ async def telegram_webhook(req: Request):
         chat_id = message["chat"]["id"]
         message_id = message["message_id"]
 
-        answer_callback(callback_id)
-
-        if chat_id not in DRAFTS:
-            DRAFTS[chat_id] = {"title": "", "project": "default", "priority": 3, "priority_label": "Normal", "due": None, "due_label": "No due date"}
-
-        draft = DRAFTS[chat_id]
-
-        if data == "ask_title":
-            draft["awaiting_title"] = True
-            edit_message(chat_id, message_id, "Reply with the task title (just send a message).")
-            return {"ok": True}
-
-        if data.startswith("set_project:"):
-            proj = data.split(":", 1)[1]
-            draft["project"] = proj
-            edit_message(chat_id, message_id, **menu_markup(chat_id))
-            return {"ok": True}
-
-        if data.startswith("set_priority:"):
-            num = int(data.split(":", 1)[1])
-            label = next((l for l, n in PRIORITIES if n == num), "Normal")
-            draft["priority"] = num
-            draft["priority_label"] = label
-            edit_message(chat_id, message_id, **menu_markup(chat_id))
-            return {"ok": True}
-
-        if data.startswith("set_due:"):
-            val = data.split(":", 1)[1]
-            if val == "none":
-                draft["due"] = None
-                draft["due_label"] = "No due date"
-            else:
-                draft["due"] = val
-                draft["due_label"] = next((l for l, v in DUE_CHOICES if v == val), val)
-            edit_message(chat_id, message_id, **menu_markup(chat_id))
-            return {"ok": True}
-
-        if data == "confirm_create":
-            title = (draft.get("title") or "").strip()
-            if not title:
-                edit_message(chat_id, message_id, "❌ Title is empty. Tap “Set/Change Title”.")
-                return {"ok": True}
-
-            list_id = resolve_list_id(None if draft.get("project") == "default" else draft.get("project"))
-            due_ms = due_choice_to_epoch_ms(draft.get("due"))
-            prio = draft.get("priority")
-
-            try:
-                task = create_clickup_task(
-                    list_id=list_id,
-                    name=title[:200],
-                    description=draft.get("description", ""),
-                    due_date_ms=due_ms,
-                    priority=prio,
-                )
-                edit_message(chat_id, message_id, f"✅ Created in ClickUp: {task.get('name')}")
-                DRAFTS.pop(chat_id, None)
-            except Exception as e:
-                edit_message(chat_id, message_id, f"❌ Failed to create task: {e}")
-            return {"ok": True}
-
-        if data == "cancel":
-            DRAFTS.pop(chat_id, None)
-            edit_message(chat_id, message_id, "🗑 Cancelled.")
-            return {"ok": True}
-
-        return {"ok": True}
+        spawn(answer_callback(callback_id))
+
+        action, _, arg = data.partition(":")
+        handler = CALLBACK_HANDLERS.get(action)
+        if handler:
+            await handler(chat_id, message_id, arg)
+        return OK_RESPONSE
 
     # Handle normal messages
     msg = update.get("message") or update.get("edited_message")
     if not msg:
-        return {"ok": True}
+        return OK_RESPONSE
 
     chat_id = msg["chat"]["id"]
     text = (msg.get("text") or "").strip()
+    # Stickers, photos, service messages etc. carry no title
+    if not text:
+        return OK_RESPONSE
 
-    if text in ["/start", "/new", "/task"]:
-        DRAFTS[chat_id] = {"title": "", "project": "default", "priority": 3, "priority_label": "Normal", "due": None, "due_label": "No due date"}
-        send_message(chat_id, **menu_markup(chat_id))
-        return {"ok": True}
+    # In groups Telegram sends commands as "/start@BotName"
+    if text.split("@", 1)[0] in ["/start", "/new", "/task"]:
+        draft = dict(_DEFAULT_DRAFT)
+        await set_draft(chat_id, draft)
+        spawn(send_message(chat_id, **menu_markup(draft)))
+        return OK_RESPONSE
 
     # If bot is waiting for title input
-    if chat_id in DRAFTS and DRAFTS[chat_id].get("awaiting_title"):
-        DRAFTS[chat_id]["title"] = text
-        DRAFTS[chat_id].pop("awaiting_title", None)
-        send_message(chat_id, **menu_markup(chat_id))
-        return {"ok": True}
+    draft = await get_draft(chat_id)
+    if draft and draft.get("awaiting_title"):
+        draft = await update_draft(chat_id, title=text, awaiting_title=False)
+        spawn(send_message(chat_id, **menu_markup(draft)))
+        return OK_RESPONSE
+
+    # Group chatter isn't meant for the bot; only start drafts there via commands
+    if msg["chat"].get("type") in ("group", "supergroup") and not text.startswith("/"):
+        return OK_RESPONSE
 
     # Default behavior: treat any text as new task title and show menu
-    DRAFTS[chat_id] = {
-        "title": text,
-        "description": text,
-        "project": "default",
-        "priority": 3,
-        "priority_label": "Normal",
-        "due": None,
-        "due_label": "No due date",
-    }
-    send_message(chat_id, **menu_markup(chat_id))
-    return {"ok": True}
+    draft = {**_DEFAULT_DRAFT, "title": text, "description": text}
+    await set_draft(chat_id, draft)
+    spawn(send_message(chat_id, **menu_markup(draft)))
+    return OK_RESPONSE